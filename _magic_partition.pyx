@@ -0,0 +1,202 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+
+"""
+Magic Partitioning Algorithm - Cython Implementation
+Ahead-of-time compiled counterpart of the Numba kernels in the scripts,
+with identical results and no JIT warmup. Build in place with:
+
+    cythonize -3 -i _magic_partition.pyx
+"""
+
+import numpy as np
+from libc.stdint cimport int64_t, uint8_t, uint16_t, uint32_t
+
+ctypedef fused index_t:
+    uint8_t
+    uint16_t
+    uint32_t
+
+cdef inline uint32_t _murmur3_block(uint32_t w) noexcept nogil:
+    """MurmurHash3 k1 pre-mix of one 32-bit little-endian block"""
+    w *= 0xcc9e2d51u
+    w = (w << 15) | (w >> 17)
+    return w * 0x1b873593u
+
+cdef inline uint32_t _murmur3_hh(uint32_t y, uint32_t kz) noexcept nogil:
+    """H(y, z) given kz = _murmur3_block(z), so callers can mix z once"""
+    cdef uint32_t x
+    cdef uint32_t k1
+    if y:
+        k1 = _murmur3_block(y)
+        x = (k1 << 13) | (k1 >> 19)
+        x = x * 5u + 0xe6546b64u
+    else:
+        x = 0xe6546b64u  # the y = 0 block always mixes to this state
+    x ^= kz
+    x = (x << 13) | (x >> 19)
+    x = x * 5u + 0xe6546b64u
+    # Finalization mix (fmix32) with the key length folded in
+    x ^= 8u
+    x ^= x >> 16
+    x *= 0x85ebca6bu
+    x ^= x >> 13
+    x *= 0xc2b2ae35u
+    x ^= x >> 16
+    return x
+
+cdef inline uint32_t _load_word(int64_t y, uint32_t kh, int64_t *prefix) noexcept nogil:
+    """H(y, h), filling in and reusing the prefix word H(0, h) for y = 0"""
+    if y != 0:
+        return _murmur3_hh(<uint32_t>y, kh)
+    if prefix[0] < 0:
+        prefix[0] = _murmur3_hh(0, kh)
+    return <uint32_t>prefix[0]
+
+cdef uint32_t _mp(uint32_t h, uint32_t n) noexcept nogil:
+    """Body of magic_partition; expects n >= 2"""
+    cdef int64_t s = 1
+    cdef int64_t t = 0  # retry counter
+    cdef int64_t v, p, o, y, bit
+    cdef uint32_t kh = _murmur3_block(h)
+    # H(0, h) is hashed the first time word 0 is read, then stays pinned
+    # across retries alongside the cached word
+    cdef int64_t prefix = -1
+    cdef int64_t cur_y = -1
+    cdef uint32_t cur_hash = 0
+
+    # Find s = 2^k such that s >= n
+    while s < n:
+        s <<= 1
+
+    # Each random bit is folded in with masks (-bit is 0 or all ones)
+    # instead of a branch: v += bit ? p : 0 and o -= bit ? 1 : p.
+
+    if s == n:
+        # Power of two: no value can be rejected, so t stays 0 and both
+        # sequences read B(o, h). Walk the bits once without the MSB split.
+        v = 0
+        p = s // 2
+        o = s - 1
+        while p >= 1:
+            y = o >> 5
+            if y != cur_y:
+                cur_y = y
+                cur_hash = _load_word(y, kh, &prefix)
+            bit = (cur_hash >> (o & 31)) & 1
+            v += p & -bit
+            o -= p - ((p - 1) & -bit)
+            p //= 2
+        return <uint32_t>v
+
+    while True:
+        v = 0
+        p = s // 2
+        o = s - 1
+
+        # Check MSB using bit function B
+        y = (o + t) >> 5
+        if y != cur_y:
+            cur_y = y
+            cur_hash = _load_word(y, kh, &prefix)
+        if (cur_hash >> ((o + t) & 31)) & 1:
+            # MSB = 1 path (Sequence A with retry offset t)
+            v += p
+            o -= 1
+            p //= 2
+
+            # Process remaining bits
+            while p >= 1:
+                y = (o + t) >> 5
+                if y != cur_y:
+                    cur_y = y
+                    cur_hash = _load_word(y, kh, &prefix)
+                bit = (cur_hash >> ((o + t) & 31)) & 1
+                v += p & -bit
+                if v >= n:
+                    break  # Invalid, need retry
+                o -= p - ((p - 1) & -bit)
+                p //= 2
+
+            if v < n:
+                return <uint32_t>v
+        else:
+            # MSB = 0 path (Sequence B without retry offset)
+            o -= p
+            p //= 2
+
+            # Process remaining bits
+            while p >= 1:
+                y = o >> 5
+                if y != cur_y:
+                    cur_y = y
+                    cur_hash = _load_word(y, kh, &prefix)
+                bit = (cur_hash >> (o & 31)) & 1
+                v += p & -bit
+                o -= p - ((p - 1) & -bit)
+                p //= 2
+
+            return <uint32_t>v  # Always valid in MSB = 0 path
+
+        # Increment retry counter by s for next attempt
+        t += s
+
+def hash_function_H(uint32_t y, uint32_t z):
+    """Hash function H(y, z) -> 32-bit uniform output using MurmurHash3"""
+    return _murmur3_hh(y, _murmur3_block(z))
+
+def magic_partition(uint32_t h, uint32_t n):
+    """
+    Magic Partitioning Algorithm
+
+    Args:
+        h: Hash value (32-bit unsigned integer)
+        n: Number of partitions (>= 2)
+
+    Returns:
+        Partition index in range [0, n-1] with uniform distribution
+    """
+    if n < 2:
+        raise ValueError("n must be >= 2")
+    return _mp(h, n)
+
+cdef void _mp_fill(const uint32_t[::1] hs, uint32_t n, index_t[::1] out) noexcept:
+    """Partition every hash in hs into out, with the GIL released"""
+    cdef Py_ssize_t i
+    with nogil:
+        for i in range(hs.shape[0]):
+            out[i] = <index_t>_mp(hs[i], n)
+
+def _partition_dtype(n):
+    """Narrowest unsigned dtype that holds every partition index below n"""
+    if n <= 1 << 8:
+        return np.uint8
+    if n <= 1 << 16:
+        return np.uint16
+    return np.uint32
+
+def magic_partition_batch(hashes, uint32_t n):
+    """
+    Magic Partitioning Algorithm over an array of hashes
+
+    The loop runs without the GIL, so threads can partition separate
+    arrays concurrently.
+
+    Args:
+        hashes: Array of hash values (32-bit unsigned integers)
+        n: Number of partitions (>= 2)
+
+    Returns:
+        np.ndarray of partition indices, one per hash, as uint8 for
+        n <= 256, uint16 for n <= 65536 and uint32 otherwise
+    """
+    if n < 2:
+        raise ValueError("n must be >= 2")
+    cdef const uint32_t[::1] hs = np.ascontiguousarray(hashes, dtype=np.uint32)
+    out = np.empty(hs.shape[0], dtype=_partition_dtype(n))
+    if out.dtype == np.uint8:
+        _mp_fill[uint8_t](hs, n, out)
+    elif out.dtype == np.uint16:
+        _mp_fill[uint16_t](hs, n, out)
+    else:
+        _mp_fill[uint32_t](hs, n, out)
+    return out
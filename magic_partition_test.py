@@ -1,7 +1,7 @@
 #!/usr/bin/env -S uv run
 # /// script
 # dependencies = [
-#     "mmh3",
+#     "numba",
 #     "numpy",
 # ]
 # ///
@@ -11,23 +11,51 @@ Magic Partitioning Algorithm - Simple Python Implementation
 A novel approach for uniform hash distribution across non-power-of-two partitions.
 """
 
-import mmh3
 import numpy as np
-import random
 import time
+from numba import njit, prange, uint32
 
+@njit(cache=True)
+def _murmur3_block(w):
+    """MurmurHash3 k1 pre-mix of one 32-bit little-endian block"""
+    k1 = (w * 0xcc9e2d51) & 0xffffffff
+    k1 = ((k1 << 15) | (k1 >> 17)) & 0xffffffff
+    return (k1 * 0x1b873593) & 0xffffffff
+
+@njit(cache=True)
+def _hash_H_premixed(y, kz):
+    """H(y, z) given kz = _murmur3_block(z), so callers can mix z once"""
+    if y:
+        k1 = (y * 0xcc9e2d51) & 0xffffffff
+        k1 = ((k1 << 15) | (k1 >> 17)) & 0xffffffff
+        k1 = (k1 * 0x1b873593) & 0xffffffff
+        x = ((k1 << 13) | (k1 >> 19)) & 0xffffffff
+        x = (x * 5 + 0xe6546b64) & 0xffffffff
+    else:
+        x = 0xe6546b64  # the y = 0 block always mixes to this state
+    x ^= kz
+    x = ((x << 13) | (x >> 19)) & 0xffffffff
+    x = (x * 5 + 0xe6546b64) & 0xffffffff
+    # Finalization mix (fmix32) with the key length folded in
+    x ^= 8
+    x ^= x >> 16
+    x = (x * 0x85ebca6b) & 0xffffffff
+    x ^= x >> 13
+    x = (x * 0xc2b2ae35) & 0xffffffff
+    x ^= x >> 16
+    return x
+
+@njit(cache=True)
 def hash_function_H(y, z):
     """Hash function H(y, z) -> 32-bit uniform output using MurmurHash3"""
-    # Combine y and z into bytes and hash
-    data = y.to_bytes(4, 'little') + z.to_bytes(4, 'little')
-    return mmh3.hash(data, signed=False)
+    # MurmurHash3_x86_32 (seed 0) over the 8-byte little-endian (y, z) key,
+    # written out as integer arithmetic so no bytes are packed per call
+    return _hash_H_premixed(y, _murmur3_block(z))
 
+@njit(cache=True)
 def bit_function_B(o, h):
-    """Pseudo-random bit function B(o, h) = bit_{o mod 32}(H(o/32, h))"""
-    hash_input = o // 32
-    bit_pos = o % 32
-    hash_output = hash_function_H(hash_input, h)
-    return (hash_output >> bit_pos) & 1
+    """Pseudo-random bit function B(o, h) = bit_{o mod 32}(H(⌊o/32⌋, h))"""
+    return (hash_function_H(o >> 5, h) >> (o & 31)) & 1
 
 def magic_partition(h, n):
     """
@@ -40,21 +68,78 @@ def magic_partition(h, n):
     Returns:
         Partition index in range [0, n-1] with uniform distribution
     """
-    if n < 2:
-        raise ValueError("n must be >= 2")
+    _check_n(n)
+    # _mp takes h as uint32, which would silently truncate larger values
+    if not 0 <= h <= 0xffffffff:
+        raise ValueError("h must be a 32-bit unsigned integer")
+    return _mp(h, n)
+
+@njit(cache=True)
+def _load_word(y, kh, prefix):
+    """H(y, h) plus the prefix word H(0, h), filled in if y = 0 needs it"""
+    if y != 0:
+        return _hash_H_premixed(y, kh), prefix
+    if prefix < 0:
+        prefix = _hash_H_premixed(0, kh)
+    return prefix, prefix
+
+@njit(cache=True)
+def _mp_prefixed(n, kh, prefix):
+    """
+    magic_partition given kh = _murmur3_block(h) and prefix = H(0, h)
     
+    prefix holds B(0..31, h), which every n <= 32 reads all its bits
+    from, so callers partitioning one h for several n hash it once.
+    Pass -1 to have it computed only if word 0 is actually read. Either
+    way it stays pinned alongside the cached word: after a retry has
+    moved the cache to a higher word, the MSB = 0 sequence reads word 0
+    again without rehashing it.
+    """
     # Find k such that 2^k >= n
-    k = (n - 1).bit_length()
+    k = 0
+    while (1 << k) < n:
+        k += 1
     s = 1 << k  # s = 2^k
     t = 0  # retry counter
     
+    # B(o, h) only rehashes when o // 32 changes, so keep the last
+    # H(o // 32, h) around instead of hashing once per bit, starting
+    # from the prefix word if the caller has it. The h block of H is the
+    # same for every y, so it is mixed once up front.
+    # Within a step the random bit is folded in with masks (-bit is 0 or
+    # all ones) rather than branched on, since it is a coin flip for the
+    # branch predictor: v += bit ? p : 0 and o -= bit ? 1 : p.
+    cur_y = 0 if prefix >= 0 else -1
+    cur_hash = prefix
+    
+    if n == s:
+        # Power of two: no value can be rejected, so t stays 0 and both
+        # sequences read B(o, h). Walk the bits once without the MSB split.
+        v = 0
+        p = s // 2
+        o = s - 1
+        while p >= 1:
+            y = o >> 5
+            if y != cur_y:
+                cur_y = y
+                cur_hash, prefix = _load_word(y, kh, prefix)
+            bit = (cur_hash >> (o & 31)) & 1
+            v += p & -bit
+            o -= p - ((p - 1) & -bit)
+            p //= 2
+        return v
+    
     while True:
         v = 0
         p = s // 2
         o = s - 1
         
         # Check MSB using bit function B
-        if bit_function_B(o + t, h) == 1:
+        y = (o + t) >> 5
+        if y != cur_y:
+            cur_y = y
+            cur_hash, prefix = _load_word(y, kh, prefix)
+        if (cur_hash >> ((o + t) & 31)) & 1:
             # MSB = 1 path (Sequence A with retry offset t)
             v += p
             o -= 1
@@ -62,13 +147,15 @@ def magic_partition(h, n):
             
             # Process remaining bits
             while p >= 1:
-                if bit_function_B(o + t, h) == 1:
-                    v += p
-                    if v >= n:
-                        break  # Invalid, need retry
-                    o -= 1
-                else:
-                    o -= p
+                y = (o + t) >> 5
+                if y != cur_y:
+                    cur_y = y
+                    cur_hash, prefix = _load_word(y, kh, prefix)
+                bit = (cur_hash >> ((o + t) & 31)) & 1
+                v += p & -bit
+                if v >= n:
+                    break  # Invalid, need retry
+                o -= p - ((p - 1) & -bit)
                 p //= 2
             
             if v < n:
@@ -80,11 +167,13 @@ def magic_partition(h, n):
             
             # Process remaining bits
             while p >= 1:
-                if bit_function_B(o, h) == 1:
-                    v += p
-                    o -= 1
-                else:
-                    o -= p
+                y = o >> 5
+                if y != cur_y:
+                    cur_y = y
+                    cur_hash, prefix = _load_word(y, kh, prefix)
+                bit = (cur_hash >> (o & 31)) & 1
+                v += p & -bit
+                o -= p - ((p - 1) & -bit)
                 p //= 2
             
             return v  # Always valid in MSB = 0 path
@@ -92,35 +181,451 @@ def magic_partition(h, n):
         # Increment retry counter by s for next attempt
         t += s
 
+@njit(uint32(uint32, uint32), cache=True)
+def _mp(h, n):
+    """Compiled body of magic_partition; expects n >= 2"""
+    kh = _murmur3_block(h)
+    # Only n <= 32 is sure to read word 0; larger n starts higher up and
+    # may never touch it, so leave the prefix to be filled on demand
+    prefix = _hash_H_premixed(0, kh) if n <= 32 else -1
+    return _mp_prefixed(n, kh, prefix)
+
+def _check_n(n):
+    """Raise ValueError unless n is a partition count the kernels accept"""
+    if n < 2:
+        raise ValueError("n must be >= 2")
+    # The kernels take n as uint32, which would silently truncate larger values
+    if n > 0xffffffff:
+        raise ValueError("n must fit in 32 bits")
+
+def _check_hashes(hashes):
+    """hashes as a contiguous uint32 array, rejecting values that would wrap"""
+    hashes = np.asarray(hashes)
+    if hashes.size and not np.can_cast(hashes.dtype, np.uint32):
+        if hashes.min() < 0 or hashes.max() > 0xffffffff:
+            raise ValueError("hashes must be 32-bit unsigned integers")
+    return np.ascontiguousarray(hashes, dtype=np.uint32)
+
+def _partition_dtype(n):
+    """Narrowest unsigned dtype that holds every partition index below n"""
+    if n <= 1 << 8:
+        return np.uint8
+    if n <= 1 << 16:
+        return np.uint16
+    return np.uint32
+
+def magic_partition_batch(hashes, n):
+    """
+    Magic Partitioning Algorithm over an array of hashes
+    
+    Args:
+        hashes: Array of hash values (32-bit unsigned integers)
+        n: Number of partitions (>= 2)
+    
+    Returns:
+        np.ndarray of partition indices, one per hash, as uint8 for
+        n <= 256, uint16 for n <= 65536 and uint32 otherwise
+    """
+    _check_n(n)
+    hashes = _check_hashes(hashes)
+    out = np.empty(hashes.shape[0], dtype=_partition_dtype(n))
+    _mp_batch(hashes, np.uint32(n), out)
+    return out
+
+@njit(parallel=True, cache=True)
+def _mp_batch(hs, n, out):
+    """Partition every hash in hs into out, spread across cores"""
+    for i in prange(hs.shape[0]):
+        out[i] = _mp(hs[i], n)
+
+def magic_partition_pair_batch(hashes, n_a, n_b):
+    """
+    magic_partition_batch for two partition counts in one pass
+    
+    Both partitions of each hash are computed together so the h block
+    mix and H(0, h) are shared between them, e.g. for comparing n with
+    n+1.
+    
+    Returns:
+        Tuple of np.ndarray partition indices for n_a and for n_b
+    """
+    _check_n(n_a)
+    _check_n(n_b)
+    hashes = _check_hashes(hashes)
+    out_a = np.empty(hashes.shape[0], dtype=_partition_dtype(n_a))
+    out_b = np.empty(hashes.shape[0], dtype=_partition_dtype(n_b))
+    _mp_pair_batch(hashes, np.uint32(n_a), np.uint32(n_b), out_a, out_b)
+    return out_a, out_b
+
+@njit(parallel=True, cache=True)
+def _mp_pair_batch(hs, n_a, n_b, out_a, out_b):
+    """Partition every hash in hs for both n_a and n_b"""
+    for i in prange(hs.shape[0]):
+        kh = _murmur3_block(hs[i])
+        prefix = _hash_H_premixed(0, kh)
+        out_a[i] = _mp_prefixed(n_a, kh, prefix)
+        out_b[i] = _mp_prefixed(n_b, kh, prefix)
+
+_partitioners = {}  # n -> (partition, partition_batch)
+
+def _emit_bit(lines, indent, off):
+    """Append source that leaves B(off, h) in `bit`, reusing the cached word"""
+    pad = " " * indent
+    lines.append(f"{pad}y = ({off}) >> 5")
+    lines.append(f"{pad}if y != cur_y:")
+    lines.append(f"{pad}    cur_y = y")
+    lines.append(f"{pad}    cur_hash = _hash_H_premixed(y, kh)")
+    lines.append(f"{pad}bit = (cur_hash >> (({off}) & 31)) & 1")
+
+def _partitioner_source(n):
+    """Source of magic_partition specialized to n, with the bit loop unrolled"""
+    k = (n - 1).bit_length()
+    s = 1 << k
+    lines = [
+        "def partition(h):",
+        "    kh = _murmur3_block(h)",
+        "    cur_y = -1",
+        "    cur_hash = 0",
+        "    v = 0",
+    ]
+    if n == s:
+        # Power of two: t stays 0 and both sequences read B(o, h)
+        lines.append(f"    o = {s - 1}")
+        for i in range(k):
+            p = 1 << (k - 1 - i)
+            _emit_bit(lines, 4, "o")
+            lines.append(f"    v += {p} & -bit")
+            lines.append(f"    o -= {p} - ({p - 1} & -bit)")
+        lines.append("    return v")
+        return "\n".join(lines) + "\n"
+    
+    lines.append("    t = 0")
+    lines.append("    while True:")
+    _emit_bit(lines, 8, f"{s - 1} + t")
+    lines.append("        if bit:")
+    # MSB = 1 path (Sequence A with retry offset t)
+    lines.append(f"            v = {s // 2}")
+    lines.append(f"            o = {s - 2}")
+    for i in range(1, k):
+        p = 1 << (k - 1 - i)
+        _emit_bit(lines, 12, "o + t")
+        lines.append(f"            v += {p} & -bit")
+        lines.append(f"            if v >= {n}:")
+        lines.append(f"                t += {s}")
+        lines.append("                continue  # Invalid, retry with the next offset")
+        lines.append(f"            o -= {p} - ({p - 1} & -bit)")
+    lines.append("            return v")
+    lines.append("        else:")
+    # MSB = 0 path (Sequence B without retry offset)
+    lines.append("            v = 0")
+    lines.append(f"            o = {s - 1 - s // 2}")
+    for i in range(1, k):
+        p = 1 << (k - 1 - i)
+        _emit_bit(lines, 12, "o")
+        lines.append(f"            v += {p} & -bit")
+        lines.append(f"            o -= {p} - ({p - 1} & -bit)")
+    lines.append("            return v")
+    return "\n".join(lines) + "\n"
+
+def make_partitioner(n):
+    """
+    Build magic_partition specialized to a fixed n
+    
+    k is fixed by n, so the bit loop is unrolled into straight-line code
+    with every p, s and n baked in as constants, then compiled with Numba.
+    Partitioners are cached per n.
+    
+    Args:
+        n: Number of partitions (>= 2)
+    
+    Returns:
+        Compiled function h -> partition index in range [0, n-1]. It is
+        typed uint32(uint32) and does no range checks of its own, so h
+        must already be a 32-bit unsigned integer.
+    """
+    _check_n(n)
+    if n not in _partitioners:
+        namespace = {"_murmur3_block": _murmur3_block, "_hash_H_premixed": _hash_H_premixed}
+        exec(_partitioner_source(n), namespace)
+        partition = njit(uint32(uint32))(namespace["partition"])
+        
+        @njit(parallel=True)
+        def partition_batch(hs, out):
+            for i in prange(hs.shape[0]):
+                out[i] = partition(hs[i])
+        
+        _partitioners[n] = (partition, partition_batch)
+    return _partitioners[n][0]
+
+def magic_partition_unrolled_batch(hashes, n):
+    """magic_partition_batch using the partitioner specialized to n"""
+    make_partitioner(n)
+    hashes = _check_hashes(hashes)
+    out = np.empty(hashes.shape[0], dtype=_partition_dtype(n))
+    _partitioners[n][1](hashes, out)
+    return out
+
+def magic_partition_uniform(h, n):
+    """
+    Uniform-only partitioning with Lemire's multiply-shift bounded map
+    
+    Maps H(0, h) to [0, n) with one multiply, rejecting the few low words
+    that would bias the result and rehashing with the next y. Cheaper
+    than magic_partition, but without its expansion property: growing
+    n to n+1 moves items between existing buckets.
+    
+    Args:
+        h: Hash value (32-bit unsigned integer)
+        n: Number of partitions (>= 2)
+    
+    Returns:
+        Partition index in range [0, n-1] with uniform distribution
+    """
+    # The rejection threshold assumes 32-bit h and n; a larger n never exits
+    _check_n(n)
+    if not 0 <= h <= 0xffffffff:
+        raise ValueError("h must be a 32-bit unsigned integer")
+    return _mp_uniform(h, n)
+
+@njit(cache=True)
+def _mp_uniform(h, n):
+    """Compiled body of magic_partition_uniform; expects n >= 2"""
+    kh = _murmur3_block(h)
+    y = 0
+    m = _hash_H_premixed(y, kh) * n
+    low = m & 0xffffffff
+    if low < n:
+        threshold = (0x100000000 - n) % n  # 2^32 mod n
+        while low < threshold:
+            y += 1
+            m = _hash_H_premixed(y, kh) * n
+            low = m & 0xffffffff
+    # m can wrap past 2^63, so keep only the 32 bits above the low word
+    return (m >> 32) & 0xffffffff
+
+def magic_partition_uniform_batch(hashes, n):
+    """magic_partition_uniform over an array of hashes"""
+    _check_n(n)
+    hashes = _check_hashes(hashes)
+    out = np.empty(hashes.shape[0], dtype=_partition_dtype(n))
+    _mp_uniform_batch(hashes, np.uint32(n), out)
+    return out
+
+@njit(parallel=True, cache=True)
+def _mp_uniform_batch(hs, n, out):
+    """Uniform-only partition of every hash in hs into out"""
+    for i in prange(hs.shape[0]):
+        out[i] = _mp_uniform(hs[i], n)
+
+def hash_H_vec(y, z):
+    """Hash function H(y, z) applied elementwise over uint32 arrays"""
+    # MurmurHash3_x86_32 as whole-array uint32 ops, which wrap like the
+    # scalar code's masks and let NumPy use SIMD across lanes
+    y = np.asarray(y, dtype=np.uint32)
+    z = np.asarray(z, dtype=np.uint32)
+    k1 = y * np.uint32(0xcc9e2d51)
+    k1 = (k1 << np.uint32(15)) | (k1 >> np.uint32(17))
+    k1 *= np.uint32(0x1b873593)
+    x = (k1 << np.uint32(13)) | (k1 >> np.uint32(19))
+    x = x * np.uint32(5) + np.uint32(0xe6546b64)
+    k1 = z * np.uint32(0xcc9e2d51)
+    k1 = (k1 << np.uint32(15)) | (k1 >> np.uint32(17))
+    k1 *= np.uint32(0x1b873593)
+    x ^= k1
+    x = (x << np.uint32(13)) | (x >> np.uint32(19))
+    x = x * np.uint32(5) + np.uint32(0xe6546b64)
+    x ^= np.uint32(8)
+    x ^= x >> np.uint32(16)
+    x *= np.uint32(0x85ebca6b)
+    x ^= x >> np.uint32(13)
+    x *= np.uint32(0xc2b2ae35)
+    x ^= x >> np.uint32(16)
+    return x
+
+def magic_partition_vec(hashes, n):
+    """
+    Magic Partitioning Algorithm over an array of hashes, in plain NumPy
+    
+    Every lane runs the same k bit steps with p shared across lanes, so
+    each step is a handful of vector ops. v only grows, so a lane that
+    went invalid in the MSB = 1 path is simply rejected after the last
+    step instead of breaking out early. Rejected lanes retry together
+    with the next offset t.
+    
+    Args:
+        hashes: Array of hash values (32-bit unsigned integers)
+        n: Number of partitions (>= 2)
+    
+    Returns:
+        np.ndarray of partition indices, one per hash
+    """
+    _check_n(n)
+    hashes = _check_hashes(hashes)
+    out = np.empty(hashes.shape[0], dtype=_partition_dtype(n))
+    
+    k = (n - 1).bit_length()
+    s = 1 << k
+    t = 0
+    idx = np.arange(hashes.shape[0])
+    
+    while idx.size:
+        h = hashes[idx]
+        
+        # MSB: every lane reads offset s - 1 + t
+        o = s - 1 + t
+        cur_y = np.full(idx.size, o >> 5, dtype=np.int64)
+        cur_hash = hash_H_vec(cur_y, h)
+        msb = (cur_hash >> np.uint32(o & 31)) & np.uint32(1)
+        p = s // 2
+        v = msb * np.uint32(p)
+        o = np.where(msb == 1, s - 2, s - 1 - p).astype(np.int64)
+        # Sequence A lanes (MSB = 1) read at o + t, sequence B lanes at o
+        shift = msb.astype(np.int64) * t
+        p //= 2
+        
+        while p >= 1:
+            off = o + shift
+            y = off >> 5
+            stale = y != cur_y
+            if stale.any():
+                cur_y[stale] = y[stale]
+                cur_hash[stale] = hash_H_vec(y[stale], h[stale])
+            bit = (cur_hash >> (off & 31).astype(np.uint32)) & np.uint32(1)
+            v += bit * np.uint32(p)
+            o -= np.where(bit == 1, 1, p)
+            p //= 2
+        
+        valid = v < n
+        out[idx[valid]] = v[valid]
+        idx = idx[~valid]
+        
+        # Increment retry counter by s for next attempt
+        t += s
+    
+    return out
+
+cuda = None  # numba.cuda, imported on first GPU use to keep startup light
+_cuda_kernel = None
+
+def _import_cuda():
+    """Import numba.cuda into the module namespace on first use"""
+    global cuda
+    if cuda is None:
+        from numba import cuda
+    return cuda
+
+def _build_cuda_kernel():
+    """Compile the CUDA kernel on first use"""
+    murmur3_block = cuda.jit(device=True)(_murmur3_block.py_func)
+    hash_H_premixed = cuda.jit(device=True)(_hash_H_premixed.py_func)
+    
+    @cuda.jit
+    def magic_partition_kernel(hs, n, out):
+        """One thread per hash; the cached H word lives in registers"""
+        i = cuda.grid(1)
+        if i >= hs.shape[0]:
+            return
+        kh = murmur3_block(hs[i])
+        s = 1
+        while s < n:
+            s <<= 1
+        t = 0
+        cur_y = 0
+        cur_hash = hash_H_premixed(0, kh)
+        while True:
+            p = s // 2
+            o = s - 1
+            
+            # Check MSB using bit function B
+            y = (o + t) >> 5
+            if y != cur_y:
+                cur_y = y
+                cur_hash = hash_H_premixed(y, kh)
+            msb = (cur_hash >> ((o + t) & 31)) & 1
+            # Both MSB paths share one loop so a warp stays converged:
+            # MSB = 1 reads Sequence A at o + t, MSB = 0 Sequence B at o
+            v = p & -msb
+            o -= p - ((p - 1) & -msb)
+            t_seq = t & -msb
+            p //= 2
+            
+            while p >= 1:
+                y = (o + t_seq) >> 5
+                if y != cur_y:
+                    cur_y = y
+                    cur_hash = hash_H_premixed(y, kh)
+                bit = (cur_hash >> ((o + t_seq) & 31)) & 1
+                v += p & -bit
+                if v >= n:
+                    break  # Invalid, need retry
+                o -= p - ((p - 1) & -bit)
+                p //= 2
+            
+            if v < n:
+                out[i] = v
+                return
+            
+            # Increment retry counter by s for next attempt
+            t += s
+    
+    return magic_partition_kernel
+
+def magic_partition_cuda(hashes, n, threads_per_block=256):
+    """
+    Magic Partitioning Algorithm over an array of hashes on a CUDA GPU
+    
+    Args:
+        hashes: Array of hash values (32-bit unsigned integers)
+        n: Number of partitions (>= 2)
+        threads_per_block: CUDA block size
+    
+    Returns:
+        np.ndarray of partition indices, one per hash
+    """
+    global _cuda_kernel
+    _check_n(n)
+    hashes = _check_hashes(hashes)
+    if not _import_cuda().is_available():
+        raise RuntimeError("no CUDA device available")
+    if _cuda_kernel is None:
+        _cuda_kernel = _build_cuda_kernel()
+    
+    hashes = cuda.to_device(hashes)
+    out = cuda.device_array(hashes.shape[0], dtype=_partition_dtype(n))
+    blocks = (hashes.shape[0] + threads_per_block - 1) // threads_per_block
+    if blocks:
+        _cuda_kernel[blocks, threads_per_block](hashes, np.uint32(n), out)
+    return out.copy_to_host()
+
 def test_uniformity(n, num_tests=100000):
     """Test the uniformity of the partitioning function"""
-    counts = [0] * n
-    for _ in range(num_tests):
-        h = random.randint(0, 2**32 - 1)
-        partition = magic_partition(h, n)
-        counts[partition] += 1
+    hashes = np.random.default_rng().integers(0, 2**32, num_tests, dtype=np.uint32)
+    partitions = magic_partition_batch(hashes, n)
+    counts = np.bincount(partitions, minlength=n)
     
     expected = num_tests / n
-    max_deviation = max(abs(count - expected) / expected for count in counts)
+    max_deviation = float(np.abs(counts - expected).max() / expected)
     
     print(f"Uniformity test for n={n} with {num_tests} samples:")
     print(f"Expected count per partition: {expected:.1f}")
-    print(f"Actual counts: {counts}")
+    print(f"Actual counts: {counts.tolist()}")
     print(f"Maximum deviation from uniform: {max_deviation:.4%}")
     return max_deviation
 
-def performance_test(n, num_operations=100000):
-    """Test performance of the partitioning function"""
+def performance_test(n, num_operations=100000, partition_fn=None):
+    """Test performance of a batch partitioning function"""
+    if partition_fn is None:
+        partition_fn = magic_partition_batch
     # Generate test hashes
-    hashes = [random.randint(0, 2**32 - 1) for _ in range(num_operations)]
+    hashes = np.random.default_rng().integers(0, 2**32, num_operations, dtype=np.uint32)
+    partition_fn(hashes[:1], n)  # compile or load the kernel outside the timed region
     
     start_time = time.time()
-    for h in hashes:
-        magic_partition(h, n)
+    partition_fn(hashes, n)
     end_time = time.time()
     
     ops_per_second = num_operations / (end_time - start_time)
-    print(f"Performance test for n={n}: {ops_per_second:.0f} operations/second")
+    print(f"Performance test for n={n} ({partition_fn.__name__}): {ops_per_second:.0f} operations/second")
     return ops_per_second
 
 def test_partition_expansion_property(base_n, num_tests=100000):
@@ -133,32 +638,22 @@ def test_partition_expansion_property(base_n, num_tests=100000):
     print("-" * 50)
     
     # Generate test hashes
-    test_hashes = [random.randint(0, 2**32 - 1) for _ in range(num_tests)]
+    test_hashes = np.random.default_rng().integers(0, 2**32, num_tests, dtype=np.uint32)
     
     # Get partitions for n and n+1
-    partitions_n = [magic_partition(h, base_n) for h in test_hashes]
-    partitions_n_plus_1 = [magic_partition(h, base_n + 1) for h in test_hashes]
+    partitions_n, partitions_n_plus_1 = magic_partition_pair_batch(test_hashes, base_n, base_n + 1)
     
-    # Track movements
-    stayed_same = 0
-    moved_to_new = 0
-    moved_between_existing = 0
+    # Track movements; whatever neither stayed nor went to the new bucket
+    # moved between existing buckets (should be 0!)
+    stayed_same = int(np.count_nonzero(partitions_n == partitions_n_plus_1))
+    moved_to_new = int(np.count_nonzero(partitions_n_plus_1 == base_n))
+    moved_between_existing = num_tests - stayed_same - moved_to_new
     
-    movements = {}  # (from, to) -> count
-    
-    for i in range(num_tests):
-        old_bucket = partitions_n[i]
-        new_bucket = partitions_n_plus_1[i]
-        
-        movement = (old_bucket, new_bucket)
-        movements[movement] = movements.get(movement, 0) + 1
-        
-        if old_bucket == new_bucket:
-            stayed_same += 1
-        elif new_bucket == base_n:  # Moved to the new bucket
-            moved_to_new += 1
-        else:  # Moved between existing buckets (should be 0!)
-            moved_between_existing += 1
+    # Pack each (from, to) pair into one int and histogram the packed keys;
+    # widen first, since the partitions may be uint8
+    stride = base_n + 1
+    keys = partitions_n.astype(np.intp) * stride + partitions_n_plus_1
+    movements = np.bincount(keys, minlength=stride * stride).reshape(stride, stride)  # [from, to] -> count
     
     print(f"Results for {num_tests} hash values:")
     print(f"  Stayed in same bucket: {stayed_same} ({stayed_same/num_tests:.2%})")
@@ -177,9 +672,9 @@ def test_partition_expansion_property(base_n, num_tests=100000):
     
     # Show detailed movement matrix
     print(f"\nMovement breakdown:")
-    for from_bucket in range(base_n):
-        to_same = movements.get((from_bucket, from_bucket), 0)
-        to_new = movements.get((from_bucket, base_n), 0)
+    stayed_counts = movements.diagonal()[:base_n].tolist()
+    new_counts = movements[:base_n, base_n].tolist()
+    for from_bucket, (to_same, to_new) in enumerate(zip(stayed_counts, new_counts)):
         total_from = to_same + to_new
         
         if total_from > 0:
@@ -194,9 +689,10 @@ def test_partition_expansion_property(base_n, num_tests=100000):
         
         # Show the violations
         print("  Violations:")
-        for (from_b, to_b), count in movements.items():
-            if from_b < base_n and to_b < base_n and from_b != to_b:
-                print(f"    {count} items: bucket {from_b} → bucket {to_b}")
+        between = movements[:base_n, :base_n].copy()
+        np.fill_diagonal(between, 0)
+        for from_b, to_b in zip(*np.nonzero(between)):
+            print(f"    {between[from_b, to_b]} items: bucket {from_b} → bucket {to_b}")
     
     return moved_between_existing == 0
 
@@ -239,8 +735,14 @@ def main():
         print("The algorithm violates the expected expansion behavior.")
     
     print("\n4. Performance tests:")
+    has_gpu = _import_cuda().is_available()
     for n in [7, 100]:
         performance_test(n, 50000)
+        performance_test(n, 50000, magic_partition_unrolled_batch)
+        performance_test(n, 50000, magic_partition_vec)
+        performance_test(n, 50000, magic_partition_uniform_batch)
+        if has_gpu:
+            performance_test(n, 50000, magic_partition_cuda)
     
     print("\n5. Comparison with modulo method expansion:")
     # Show how modulo method violates the expansion property